@@ -11,28 +11,42 @@ Usage:
     python snow_agent.py "Add a custom field called Customer Priority to incident"
 """
 
+import functools
 import os
+import reprlib
 import sys
+from collections import namedtuple
 from typing import List, Dict
 
-import anthropic
 from dotenv import load_dotenv
 
 from snow_client import ServiceNowClient
-from tools import TOOL_DEFINITIONS, execute_tool
+from tools import TOOL_DEFINITIONS, compact_result, execute_tools_bulk
 
-load_dotenv()
+# Seconds without a streamed chunk before the Anthropic request is abandoned
+STREAM_IDLE_TIMEOUT = 30.0
+
+# Context growth limits: each tool result is capped when it enters the
+# history, and results older than the most recent messages are elided.
+MAX_RESULT_CHARS = 8192
+KEEP_RECENT_MESSAGES = 20
+
+# Application scopes listed in the instance-specific system prompt
+MAX_PROMPT_SCOPES = 20
 
 # ---------------------------------------------------------------------------
 # System prompt — encodes deep ServiceNow knowledge
 # ---------------------------------------------------------------------------
 
-SYSTEM_PROMPT = """You are a ServiceNow AI Agent — an autonomous assistant with full read/write access to a ServiceNow instance via its REST API. Your job is to fulfill developer requests by reading the current instance state and making precise, targeted configuration changes.
+SYSTEM_PROMPT_TEMPLATE = """You are a ServiceNow AI Agent — an autonomous assistant with full read/write access to a ServiceNow instance via its REST API. Your job is to fulfill developer requests by reading the current instance state and making precise, targeted configuration changes.
 
 Think of yourself as Claude Code, but for ServiceNow. You understand the platform deeply and work autonomously through multi-step tasks.
 
 ## Tools
-You have tools for CRUD on any ServiceNow table (query_records, get_record, create_record, update_record, delete_record), plus helpers for schema inspection (get_table_schema, search_tables), and environment awareness (get_update_sets, get_application_scopes).
+You have tools for CRUD on any ServiceNow table (query_records, get_record, create_record, update_record, delete_record), count_records for record counts, plus helpers for schema inspection (get_table_schema, search_tables), and environment awareness (get_update_sets, get_application_scopes).
+
+When you need to read from several tables at once, use batch_query_records to issue all the queries in a single tool call instead of calling query_records repeatedly.
+Likewise, when you have more than two record reads or writes ready at once, send them together with batch_records instead of separate get_record/create_record/update_record/delete_record calls.
 
 ## Core Principle: Read Before You Write
 Always query the relevant tables first to understand existing state before creating or modifying anything. This prevents duplicates, respects existing patterns, and ensures you're working in the right context.
@@ -261,34 +275,7 @@ Changes made via REST API are captured in the authenticated user's **current upd
 ---
 
 ### Common Tables Quick Reference
-| Table | Purpose |
-|-------|---------|
-| incident | Incidents |
-| task | Base task (parent of incident, change_request, etc.) |
-| change_request | Change requests |
-| problem | Problems |
-| sc_cat_item | Service catalog items |
-| sc_request | Service requests |
-| sc_req_item | Requested items |
-| sys_user | Users |
-| sys_user_group | Groups |
-| cmdb_ci | Configuration items |
-| sys_dictionary | Field definitions |
-| sys_db_object | Table definitions |
-| sys_script | Business rules |
-| sys_script_client | Client scripts |
-| sys_ui_policy | UI policies |
-| sys_ui_policy_action | UI policy actions |
-| sys_ui_element | Form field placement |
-| sys_ui_section | Form sections |
-| sys_choice | Choice list values |
-| sys_update_set | Update sets |
-| sys_scope | Application scopes |
-| sys_properties | System properties |
-| sys_trigger | Scheduled jobs |
-| sysevent_script_action | Event script actions |
-| sys_flow | Flow Designer flows |
-| wf_workflow | Legacy workflows |
+{{ common_tables_section }}
 
 ---
 
@@ -321,22 +308,122 @@ Changes made via REST API are captured in the authenticated user's **current upd
 9. **Update set transparency**: Tell the developer which update set their changes are captured in.
 """
 
+# Rows of the "Common Tables Quick Reference" section: (table, purpose)
+COMMON_TABLES = (
+    ("incident", "Incidents"),
+    ("task", "Base task (parent of incident, change_request, etc.)"),
+    ("change_request", "Change requests"),
+    ("problem", "Problems"),
+    ("sc_cat_item", "Service catalog items"),
+    ("sc_request", "Service requests"),
+    ("sc_req_item", "Requested items"),
+    ("sys_user", "Users"),
+    ("sys_user_group", "Groups"),
+    ("cmdb_ci", "Configuration items"),
+    ("sys_dictionary", "Field definitions"),
+    ("sys_db_object", "Table definitions"),
+    ("sys_script", "Business rules"),
+    ("sys_script_client", "Client scripts"),
+    ("sys_ui_policy", "UI policies"),
+    ("sys_ui_policy_action", "UI policy actions"),
+    ("sys_ui_element", "Form field placement"),
+    ("sys_ui_section", "Form sections"),
+    ("sys_choice", "Choice list values"),
+    ("sys_update_set", "Update sets"),
+    ("sys_scope", "Application scopes"),
+    ("sys_properties", "System properties"),
+    ("sys_trigger", "Scheduled jobs"),
+    ("sysevent_script_action", "Event script actions"),
+    ("sys_flow", "Flow Designer flows"),
+    ("wf_workflow", "Legacy workflows"),
+)
+
+_TABLES_PLACEHOLDER = "{{ common_tables_section }}"
+
+
+def _render_tables(rows) -> str:
+    lines = ["| Table | Purpose |", "|-------|---------|"]
+    lines.extend(f"| {table} | {purpose} |" for table, purpose in rows)
+    return "\n".join(lines)
+
+
+SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.replace(_TABLES_PLACEHOLDER, _render_tables(COMMON_TABLES))
+
+
+def build_system_prompt(client: ServiceNowClient) -> str:
+    """Specialize the system prompt for the connected instance.
+
+    Only the quick-reference tables that exist on the instance are listed,
+    followed by its active application scopes. Falls back to the generic
+    SYSTEM_PROMPT if the instance can't be read.
+    """
+    names = ",".join(table for table, _ in COMMON_TABLES)
+    found = client.query_records(
+        "sys_db_object", query=f"nameIN{names}", fields="name", limit=len(COMMON_TABLES),
+    )
+    if not found.get("success") or not isinstance(found.get("data"), list):
+        return SYSTEM_PROMPT
+
+    present = {row.get("name") for row in found["data"]}
+    section = _render_tables([row for row in COMMON_TABLES if row[0] in present] or COMMON_TABLES)
+
+    scopes = client.get_application_scopes()
+    if scopes.get("success") and isinstance(scopes.get("data"), list) and scopes["data"]:
+        listed = ", ".join(
+            f"{s.get('name', '')} ({s.get('scope', '')})" for s in scopes["data"][:MAX_PROMPT_SCOPES]
+        )
+        section += f"\n\nActive application scopes on this instance: {listed}"
+
+    return SYSTEM_PROMPT_TEMPLATE.replace(_TABLES_PLACEHOLDER, section)
+
+
+def _system_blocks(system_prompt: str) -> List[Dict]:
+    """System prompt as a cacheable text block."""
+    return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+
+# The system prompt and tool schemas never change between iterations, so they
+# are sent as a cacheable prefix. Tools precede the system prompt in the cache
+# order; the breakpoint on the last tool lets the tool block hit the cache on
+# its own.
+CACHED_TOOLS = (*TOOL_DEFINITIONS[:-1], {**TOOL_DEFINITIONS[-1], "cache_control": {"type": "ephemeral"}})
+
 # ---------------------------------------------------------------------------
 # Agent loop
 # ---------------------------------------------------------------------------
 
+_ANTHROPIC_CLIENT = None
+
+
+def _get_anthropic():
+    """Return the shared Anthropic client, creating it on first use.
+
+    The client owns an HTTP connection pool, so reusing it across turns
+    keeps connections to the API warm.
+    """
+    global _ANTHROPIC_CLIENT
+    if _ANTHROPIC_CLIENT is None:
+        # Imported here: the SDK pulls in httpx and is slow to load, and it
+        # isn't needed on early exits (missing env vars, failed connection).
+        import anthropic
+        _ANTHROPIC_CLIENT = anthropic.Anthropic(api_key=_env_config().api_key)
+    return _ANTHROPIC_CLIENT
+
+
 def run_agent(
     client: ServiceNowClient,
     user_message: str,
     conversation_history: List[Dict],
     verbose: bool = True,
+    system_prompt: str = SYSTEM_PROMPT,
 ) -> List[Dict]:
     """
     Run one conversational turn of the agent.
     Handles the full tool-use loop until the model reaches end_turn.
     Returns the updated conversation history.
     """
-    anthropic_client = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
+    anthropic_client = _get_anthropic()
+    system = _system_blocks(system_prompt)
 
     conversation_history.append({"role": "user", "content": user_message})
 
@@ -346,47 +433,63 @@ def run_agent(
     while iteration < max_iterations:
         iteration += 1
 
-        response = anthropic_client.messages.create(
+        _elide_old_tool_results(conversation_history)
+
+        # Stream the turn so text renders as it arrives. The timeout bounds the
+        # gap between received chunks, so a hung connection raises instead of
+        # blocking the loop forever.
+        with anthropic_client.messages.stream(
             model="claude-opus-4-6",
             max_tokens=8192,
-            system=SYSTEM_PROMPT,
-            tools=TOOL_DEFINITIONS,
+            system=system,
+            tools=CACHED_TOOLS,
             messages=conversation_history,
-        )
+            timeout=STREAM_IDLE_TIMEOUT,
+        ) as stream:
+            streamed = False
+            for text in stream.text_stream:
+                if not streamed:
+                    _stream("\n")
+                    streamed = True
+                _stream(text)
+            if streamed:
+                _stream("\n")
+            response = stream.get_final_message()
 
         conversation_history.append({"role": "assistant", "content": response.content})
 
-        # Print any text the model produced
-        for block in response.content:
-            if hasattr(block, "text") and block.text:
-                _print(f"\n{block.text}")
-
         if response.stop_reason == "end_turn":
             break
 
         if response.stop_reason == "tool_use":
-            tool_results = []
-
-            for block in response.content:
-                if block.type != "tool_use":
-                    continue
-
-                tool_name = block.name
-                tool_input = block.input
-
-                if verbose:
-                    _print(f"\n  [tool] {tool_name}({_summarize(tool_input)})", color="yellow")
-
-                result_str = execute_tool(tool_name, tool_input, client)
-
-                if verbose:
-                    _print(f"  [result] {_truncate(result_str, 400)}", color="cyan")
-
-                tool_results.append({
+            tool_use_blocks = [b for b in response.content if b.type == "tool_use"]
+
+            if verbose:
+                _print_many([
+                    (f"\n  [tool] {block.name}({_summarize(block.input)})", "yellow")
+                    for block in tool_use_blocks
+                ])
+
+            def show(i: int, result: str):
+                _print(f"  [result] {tool_use_blocks[i].name}: {_truncate(result, 400)}", color="cyan")
+
+            # Reads run concurrently and writes in order (see execute_tools_bulk).
+            # Each result is shown as soon as it lands; the tool_result list
+            # keeps the original block order.
+            results = execute_tools_bulk(
+                [(block.name, block.input) for block in tool_use_blocks],
+                client,
+                on_result=show if verbose else None,
+            )
+
+            tool_results = [
+                {
                     "type": "tool_result",
                     "tool_use_id": block.id,
-                    "content": result_str,
-                })
+                    "content": compact_result(result, MAX_RESULT_CHARS),
+                }
+                for block, result in zip(tool_use_blocks, results)
+            ]
 
             conversation_history.append({"role": "user", "content": tool_results})
         else:
@@ -397,6 +500,25 @@ def run_agent(
     return conversation_history
 
 
+def _elide_old_tool_results(history: List[Dict]):
+    """Replace tool_result payloads outside the recent window with a stub.
+
+    The blocks themselves are kept so every tool_use still has its matching
+    tool_result; only the (potentially large) content is dropped. The first
+    message is the original request and is never touched.
+    """
+    for message in history[1:-KEEP_RECENT_MESSAGES]:
+        content = message["content"]
+        if message["role"] != "user" or not isinstance(content, list):
+            continue
+        for block in content:
+            if block.get("type") != "tool_result":
+                continue
+            body = block.get("content")
+            if isinstance(body, str) and not body.startswith("[tool_result elided"):
+                block["content"] = f"[tool_result elided: {len(body)} bytes]"
+
+
 # ---------------------------------------------------------------------------
 # Output helpers (rich if available, plain fallback)
 # ---------------------------------------------------------------------------
@@ -405,14 +527,25 @@ try:
     from rich.console import Console
     from rich.panel import Panel
     from rich.prompt import Prompt
+    from rich.text import Text
 
     _console = Console()
 
+    # Output is built as Text objects rather than markup strings: tool results
+    # and model text are full of [...] that rich would otherwise scan as tags.
+
     def _print(text: str, color: str = None):
         if color:
-            _console.print(f"[{color}]{text}[/{color}]")
+            _console.print(Text(text, style=color))
         else:
-            _console.print(text)
+            _console.print(text, markup=False)
+
+    def _print_many(lines: List[tuple]):
+        """Print (text, color) pairs with a single console write."""
+        _console.print(Text("\n").join(Text(text, style=color or "") for text, color in lines))
+
+    def _stream(text: str):
+        _console.print(text, end="", markup=False, highlight=False, soft_wrap=True)
 
     def _input(prompt: str) -> str:
         return Prompt.ask(prompt)
@@ -429,6 +562,12 @@ except ImportError:
     def _print(text: str, color: str = None):
         print(text)
 
+    def _print_many(lines: List[tuple]):
+        print("\n".join(text for text, _ in lines))
+
+    def _stream(text: str):
+        print(text, end="", flush=True)
+
     def _input(prompt: str) -> str:
         return input(f"{prompt}: ").strip()
 
@@ -439,9 +578,26 @@ except ImportError:
         print("=" * 60)
 
 
+# Bounded repr for tool input summaries: large nested payloads (e.g. the data
+# dict of create_record) are abbreviated instead of serialized in full.
+_short_repr = reprlib.Repr()
+_short_repr.maxstring = 40
+_short_repr.maxother = 40
+_short_repr.maxdict = 4
+_short_repr.maxlist = 4
+_short_repr.maxlevel = 2
+
+
 def _summarize(d: dict, max_len: int = 120) -> str:
-    import json
-    s = json.dumps(d, default=str)
+    parts = []
+    length = 0
+    for k, v in d.items():
+        part = f"{k}={_short_repr.repr(v)}"
+        parts.append(part)
+        length += len(part) + 2
+        if length > max_len:
+            break
+    s = ", ".join(parts)
     return s[:max_len] + "..." if len(s) > max_len else s
 
 
@@ -453,20 +609,30 @@ def _truncate(s: str, max_len: int = 400) -> str:
 # Main
 # ---------------------------------------------------------------------------
 
+_REQUIRED_ENV = ("SNOW_INSTANCE", "SNOW_USERNAME", "SNOW_PASSWORD", "ANTHROPIC_API_KEY")
+
+EnvConfig = namedtuple("EnvConfig", "instance username password api_key")
+
+
+@functools.lru_cache(maxsize=None)
+def _env_config() -> EnvConfig:
+    """Load .env once and return the required settings (missing ones are empty)."""
+    load_dotenv()
+    return EnvConfig(*(os.environ.get(v, "") for v in _REQUIRED_ENV))
+
+
 def main():
     _header()
 
     # Validate environment
-    missing = [v for v in ("SNOW_INSTANCE", "SNOW_USERNAME", "SNOW_PASSWORD", "ANTHROPIC_API_KEY")
-               if not os.environ.get(v)]
+    env = _env_config()
+    missing = [var for var, value in zip(_REQUIRED_ENV, env) if not value]
     if missing:
         _print(f"\nMissing required environment variables: {', '.join(missing)}", color="red")
         _print("Copy .env.example to .env and fill in your credentials.")
         sys.exit(1)
 
-    instance = os.environ["SNOW_INSTANCE"]
-    username = os.environ["SNOW_USERNAME"]
-    password = os.environ["SNOW_PASSWORD"]
+    instance, username, password, _ = env
 
     # Connect
     _print(f"\nConnecting to {instance}.service-now.com as {username}...", color="blue")
@@ -491,16 +657,21 @@ def main():
             names = [s.get("name", "Unknown") for s in sets[:3]]
             _print(f"In-progress update sets: {', '.join(names)}", color="blue")
 
+    # Tailor the prompt's table reference to this instance
+    system_prompt = build_system_prompt(client)
+
     conversation_history: List[Dict] = []
 
     # Non-interactive mode: single command from CLI args
     if len(sys.argv) > 1:
         prompt = " ".join(sys.argv[1:])
         _print(f"\nTask: {prompt}\n")
-        run_agent(client, prompt, conversation_history)
+        run_agent(client, prompt, conversation_history, system_prompt=system_prompt)
         return
 
     # Interactive REPL
+    from anthropic import APIError
+
     _print("\nReady. Describe what you want to configure.\n", color="green")
     _print("Examples:")
     _print("  • Add a 'Customer Priority' choice field to the incident table with values Low/Medium/High")
@@ -534,8 +705,10 @@ def main():
             continue
 
         try:
-            conversation_history = run_agent(client, user_input, conversation_history)
-        except anthropic.APIError as exc:
+            conversation_history = run_agent(
+                client, user_input, conversation_history, system_prompt=system_prompt,
+            )
+        except APIError as exc:
             _print(f"\nAnthropic API error: {exc}", color="red")
         except KeyboardInterrupt:
             _print("\nInterrupted. Type 'exit' to quit or continue with a new request.")
@@ -3,9 +3,168 @@ ServiceNow REST API client.
 Wraps the Table API for CRUD operations on any table.
 """
 
+import base64
+import concurrent.futures
+import functools
 import json
+import os
+import threading
+import time
+import uuid
+import warnings
 import requests
-from typing import Optional, Dict, Any, List
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, Callable, List, Tuple, Union
+from urllib.parse import urlencode
+from urllib3.util.retry import Retry
+
+# orjson parses large payloads several times faster and accepts bytes directly
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, default=str)
+
+# Connections kept alive per host; sized for parallel tool calls
+POOL_SIZE = 32
+
+# Rate limiting (429, honouring Retry-After) and transient gateway errors are
+# retried with backoff. POST is left out so a create that reached the
+# instance is never replayed as a duplicate.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=[429, 502, 503, 504],
+    allowed_methods=frozenset(["GET", "PATCH", "DELETE"]),
+    raise_on_status=False,
+)
+
+# Most subrequests sent in one Batch API call; longer lists are split
+BATCH_MAX = 100
+
+# Batch API failures that mean none of the subrequests ran, so the chunk can
+# safely be replayed as individual calls
+_BATCH_NOT_RUN = frozenset({400, 401, 403, 404})
+
+# Headers sent with every Batch API subrequest
+_BATCH_HEADERS = [
+    {"name": "Content-Type", "value": "application/json"},
+    {"name": "Accept", "value": "application/json"},
+]
+
+
+# Field lists for the schema helpers, pre-joined into sysparm_fields values
+_SCHEMA_FIELDS = (
+    "element,column_label,internal_type,max_length,mandatory,"
+    "read_only,reference,default_value,comments,active"
+)
+_TABLE_FIELDS = "name,label,super_class,sys_scope,is_extendable"
+_UPDATE_SET_FIELDS = "name,description,state,sys_created_by,sys_created_on"
+_SCOPE_FIELDS = "name,scope,version,active"
+_USER_FIELDS = "user_name,name,email,roles"
+
+
+# Writes to these tables can change what the cached metadata helpers return
+METADATA_TABLES = frozenset({"sys_dictionary", "sys_db_object", "sys_scope", "sys_update_set"})
+
+# Most metadata results kept at once; the oldest entry is evicted first
+SCHEMA_CACHE_SIZE = 512
+
+# Conditional-GET validators (ETag / Last-Modified) kept with their results
+ETAG_CACHE_SIZE = 256
+
+# Short-lived cache for repeated query_records reads
+QUERY_CACHE_TTL = 30
+QUERY_CACHE_SIZE = 2048
+
+# Tables whose contents change underneath us (logs, queues, tracked
+# customer updates); their queries always go to the instance
+VOLATILE_TABLES = frozenset({
+    "sys_update_xml", "syslog", "sys_audit", "sys_journal_field",
+    "ecc_queue", "sys_trigger", "sysevent",
+})
+
+
+@functools.lru_cache(maxsize=1024)
+def _canon_query(query: str) -> Optional[str]:
+    """Order-independent form of an AND-only encoded query, or None.
+
+    Clauses are split on ^, empty ones dropped and the rest sorted, so
+    'active=true^priority=1' and 'priority=1^active=true^' share a key.
+    Queries using OR, NQ or ORDERBY clauses depend on clause order and
+    return None (not cacheable), as do queries with a ^^ (escaped literal
+    caret), which splitting on ^ would merge with the unescaped form.
+    """
+    if "^^" in query:
+        return None
+    clauses = [c for c in query.split("^") if c and c != "EQ"]
+    if any(c.startswith(("OR", "NQ")) for c in clauses):
+        return None
+    return "^".join(sorted(clauses))
+
+
+def _evict_oldest(cache: Dict, limit: int):
+    """Make room for one more entry in an insertion-ordered cache."""
+    while len(cache) >= limit:
+        del cache[next(iter(cache))]
+
+
+def _http2_session(auth: Tuple[str, str], headers: Dict[str, str]):
+    """httpx client with an HTTP/2 transport, or None if httpx[http2] is missing.
+
+    Optional (pip install "httpx[http2]"), enabled with SNOW_HTTP2=1. httpx is
+    imported only here so ordinary startups never pay for it.
+    """
+    try:
+        import h2  # noqa: F401  (httpx needs it for http2=True)
+        import httpx
+    except ImportError:
+        warnings.warn('SNOW_HTTP2 is set but "httpx[http2]" is not installed; using requests')
+        return None
+    # HTTP/2 multiplexes concurrent calls over one connection. The httpx
+    # client exposes the same request() interface as requests.Session.
+    return httpx.Client(
+        auth=auth,
+        headers=headers,
+        transport=httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        ),
+    )
+
+
+def _ttl_cached(seconds: float):
+    """Cache a successful method result per arguments for `seconds`."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with self._cache_lock:
+                hit = self._schema_cache.get(key)
+                generation = self._schema_generation
+            if hit and now - hit[0] < seconds:
+                return hit[1]
+            result = method(self, *args, **kwargs)
+            if result.get("success"):
+                with self._cache_lock:
+                    # A metadata write landed mid-fetch: the result may predate it
+                    if self._schema_generation != generation:
+                        return result
+                    cache = self._schema_cache
+                    cache.pop(key, None)
+                    _evict_oldest(cache, SCHEMA_CACHE_SIZE)
+                    cache[key] = (now, result)
+            return result
+        return wrapper
+    return decorator
 
 
 class ServiceNowError(Exception):
@@ -24,43 +183,177 @@ class ServiceNowClient:
 
         self.base_url = f"https://{instance}.service-now.com"
         self.instance = instance
-        self.session = requests.Session()
-        self.session.auth = (username, password)
-        self.session.headers.update({
+        headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
-        })
+        }
+
+        self.session = None
+        if os.environ.get("SNOW_HTTP2", "").lower() in ("1", "true", "yes"):
+            self.session = _http2_session((username, password), headers)
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.auth = (username, password)
+            self.session.headers.update(headers)
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=_RETRY)
+            self.session.mount("https://", adapter)
+
+        # Bounds in-flight requests so parallel tool calls can't trip rate limits
+        self._sem = threading.Semaphore(int(os.environ.get("SNOW_MAX_CONCURRENT", "8")))
+
+        # Metadata reads (schema, tables, scopes, update sets) cached by _ttl_cached
+        self._schema_cache: Dict[tuple, Tuple[float, Dict]] = {}
+        # query_records results keyed by table and canonical query (see _query_key)
+        self._query_cache: Dict[tuple, Tuple[float, Dict]] = {}
+        # Conditional GETs: request key -> (ETag, Last-Modified, result)
+        self._etags: Dict[tuple, Tuple[Optional[str], Optional[str], Dict]] = {}
+        # Bumped by every invalidation, so a read that started before one
+        # never stores its (possibly stale) result after it
+        self._schema_generation = 0
+        self._query_epoch = 0
+        self._table_generations: Dict[str, int] = {}
+        self._cache_lock = threading.Lock()
 
     def _url(self, path: str) -> str:
         return f"{self.base_url}{path}"
 
-    def _handle_response(self, response: requests.Response) -> Dict:
-        if response.status_code == 204:
+    def _request(
+        self,
+        method: str,
+        path: str,
+        raw: bool = False,
+        timeout: float = 30,
+        conditional: bool = False,
+        **kwargs,
+    ) -> Dict:
+        """Send one REST call over the pooled session and parse the response.
+
+        Every client call goes through here, so all of them share the
+        keep-alive connections and the concurrency bound. With
+        conditional=True a GET revalidates its previous result using the
+        ETag / Last-Modified the instance sent; a 304 reuses that result
+        without transferring or parsing the body again.
+        """
+        key = None
+        if conditional and method == "GET":
+            key = (path, tuple(sorted((kwargs.get("params") or {}).items())), raw)
+            with self._cache_lock:
+                known = self._etags.get(key)
+            if known:
+                headers = {}
+                if known[0]:
+                    headers["If-None-Match"] = known[0]
+                if known[1]:
+                    headers["If-Modified-Since"] = known[1]
+                kwargs["headers"] = headers
+
+        with self._sem:
+            response = self.session.request(method, self._url(path), timeout=timeout, **kwargs)
+
+        if key is not None:
+            if response.status_code == 304 and known:
+                return known[2]
+            etag = response.headers.get("ETag")
+            modified = response.headers.get("Last-Modified")
+            result = self._handle_response(response, raw)
+            if result["success"] and (etag or modified):
+                with self._cache_lock:
+                    self._etags.pop(key, None)
+                    _evict_oldest(self._etags, ETAG_CACHE_SIZE)
+                    self._etags[key] = (etag, modified, result)
+            return result
+        return self._handle_response(response, raw)
+
+    def invalidate_cache(self):
+        """Drop all cached reads."""
+        with self._cache_lock:
+            self._schema_cache.clear()
+            self._query_cache.clear()
+            self._etags.clear()
+            self._schema_generation += 1
+            self._query_epoch += 1
+
+    def _after_write(self, table: str, result: Dict) -> Dict:
+        """Drop cached reads a successful write to `table` may have made stale.
+
+        The metadata tables describe each other (a new sys_db_object row
+        changes what get_table_schema reads from sys_dictionary), so a write
+        to any of them drops the cached queries of all of them.
+        """
+        if result["success"]:
+            self._invalidate_table(table)
+        return result
+
+    def _invalidate_table(self, table: str):
+        """Drop cached reads of `table` (see _after_write)."""
+        tables = METADATA_TABLES if table in METADATA_TABLES else (table,)
+        with self._cache_lock:
+            if table in METADATA_TABLES:
+                self._schema_cache.clear()
+                self._schema_generation += 1
+            for name in tables:
+                self._table_generations[name] = self._table_generations.get(name, 0) + 1
+            for key in [k for k in self._query_cache if k[0] in tables]:
+                del self._query_cache[key]
+            # Last-Modified has one-second resolution, so a validator kept
+            # from before the write could still earn a 304 afterwards.
+            # Conditional GETs are all /api/now/table/<name>[/<sys_id>].
+            for key in [k for k in self._etags if k[0].split("/")[4] in tables]:
+                del self._etags[key]
+
+    def _query_generation(self, table: str) -> Tuple[int, int]:
+        """Invalidation count for `table`'s cached queries (call with the lock held)."""
+        return self._query_epoch, self._table_generations.get(table, 0)
+
+    def _handle_response(self, response: requests.Response, raw: bool = False) -> Dict:
+        return self._parse_result(response.status_code, response.content, raw)
+
+    @staticmethod
+    def _parse_result(status_code: int, content: bytes, raw: bool = False) -> Dict:
+        """Turn a status code and raw body into the standard result dict.
+
+        With raw=True a successful result is returned as {"success": True,
+        "raw": "<JSON text of the result>"} instead of parsed data, for
+        callers that only re-serialize it (e.g. into a tool_result).
+        """
+        if status_code == 204:
             return {"success": True, "data": {"message": "Operation completed (no content returned)"}}
 
-        if response.status_code in (200, 201):
+        if status_code in (200, 201) and raw:
+            body = content.strip()
+            # Table API bodies are exactly {"result":...}; slice the value out
+            # without decoding it. Anything else takes the parse/dump path.
+            if body.startswith(b'{"result":') and body.endswith(b"}"):
+                return {"success": True, "raw": body[10:-1].decode("utf-8", errors="replace")}
             try:
-                body = response.json()
+                parsed = _loads(body)
+                return {"success": True, "raw": _dumps(parsed.get("result", parsed))}
+            except Exception:
+                return {"success": True, "data": content.decode("utf-8", errors="replace")}
+
+        if status_code in (200, 201):
+            try:
+                body = _loads(content)
                 return {"success": True, "data": body.get("result", body)}
             except Exception:
-                return {"success": True, "data": response.text}
+                return {"success": True, "data": content.decode("utf-8", errors="replace")}
 
         # Error path
-        error_msg = f"HTTP {response.status_code}"
+        error_msg = f"HTTP {status_code}"
         detail = ""
         try:
-            body = response.json()
+            body = _loads(content)
             err = body.get("error", {})
             error_msg = err.get("message", error_msg)
             detail = err.get("detail", "")
         except Exception:
-            detail = response.text[:500]
+            detail = content[:500].decode("utf-8", errors="replace")
 
         return {
             "success": False,
             "error": error_msg,
             "detail": detail,
-            "status_code": response.status_code,
+            "status_code": status_code,
         }
 
     # -------------------------------------------------------------------------
@@ -71,13 +364,96 @@ class ServiceNowClient:
         self,
         table: str,
         query: str = "",
-        fields: Optional[List[str]] = None,
+        fields: Optional[Union[List[str], str]] = None,
         limit: int = 10,
         offset: int = 0,
         display_value: bool = False,
         order_by: str = "",
+        raw: bool = False,
     ) -> Dict:
-        """Query records from any table using encoded query syntax."""
+        """Query records from any table using encoded query syntax.
+
+        Pass raw=True to get the result back as JSON text (see _parse_result).
+        """
+        key = self._query_key(table, query, fields, limit, offset, display_value, order_by, raw)
+        params = self._query_params(query, fields, limit, offset, display_value, order_by)
+        return self._cached_read(
+            key,
+            lambda: self._request(
+                "GET", f"/api/now/table/{table}", raw=raw, conditional=table in METADATA_TABLES, params=params
+            ),
+        )
+
+    def _cached_read(self, key: Optional[tuple], fetch: Callable[[], Dict]) -> Dict:
+        """Serve `key` from the query cache, or call `fetch` and cache a success.
+
+        Keys start with the table name so _after_write can drop them; a None
+        key bypasses the cache.
+        """
+        now = time.monotonic()
+        if key is not None:
+            with self._cache_lock:
+                hit = self._query_cache.get(key)
+                generation = self._query_generation(key[0])
+            if hit and now - hit[0] < QUERY_CACHE_TTL:
+                return hit[1]
+
+        result = fetch()
+
+        if key is not None and result["success"]:
+            with self._cache_lock:
+                # A write to the table landed mid-fetch: the result may predate it
+                if self._query_generation(key[0]) != generation:
+                    return result
+                self._query_cache.pop(key, None)
+                _evict_oldest(self._query_cache, QUERY_CACHE_SIZE)
+                self._query_cache[key] = (now, result)
+        return result
+
+    def count(self, table: str, query: str = "") -> Dict:
+        """Count the records matching an encoded query (Aggregate API).
+
+        Only the number comes back, so this is far cheaper than query_records
+        for "how many" questions. Counts share the query cache and its
+        invalidation on writes.
+        """
+        canon = None if table in VOLATILE_TABLES else _canon_query(query)
+        key = None if canon is None else (table, canon, "count")
+        params = {"sysparm_count": "true"}
+        if query:
+            params["sysparm_query"] = query
+
+        def fetch() -> Dict:
+            result = self._request("GET", f"/api/now/stats/{table}", params=params)
+            if not result["success"]:
+                return result
+            stats = result["data"].get("stats", {}) if isinstance(result["data"], dict) else {}
+            return {"success": True, "data": {"table": table, "count": int(stats.get("count", 0))}}
+
+        return self._cached_read(key, fetch)
+
+    @staticmethod
+    def _query_key(table, query, fields, limit, offset, display_value, order_by, raw) -> Optional[tuple]:
+        """Cache key for a query_records call, or None if it must not be cached."""
+        if table in VOLATILE_TABLES:
+            return None
+        canon = _canon_query(query)
+        if canon is None:
+            return None
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return (table, canon, tuple(sorted(fields or ())), limit, offset, display_value, order_by, raw)
+
+    @staticmethod
+    def _query_params(
+        query: str = "",
+        fields: Optional[Union[List[str], str]] = None,
+        limit: int = 10,
+        offset: int = 0,
+        display_value: bool = False,
+        order_by: str = "",
+    ) -> Dict[str, Any]:
+        """Build Table API query parameters for query_records."""
         params: Dict[str, Any] = {
             "sysparm_limit": min(limit, 1000),
             "sysparm_offset": offset,
@@ -91,37 +467,30 @@ class ServiceNowClient:
             params["sysparm_query"] = f"ORDERBY{order_by}"
 
         if fields:
-            params["sysparm_fields"] = ",".join(fields)
+            params["sysparm_fields"] = fields if isinstance(fields, str) else ",".join(fields)
         if display_value:
             params["sysparm_display_value"] = "true"
-
-        response = self.session.get(
-            self._url(f"/api/now/table/{table}"),
-            params=params,
-            timeout=30,
-        )
-        return self._handle_response(response)
+        return params
 
     def get_record(
         self,
         table: str,
         sys_id: str,
-        fields: Optional[List[str]] = None,
+        fields: Optional[Union[List[str], str]] = None,
         display_value: bool = False,
+        raw: bool = False,
     ) -> Dict:
-        """Retrieve a single record by sys_id."""
+        """Retrieve a single record by sys_id.
+
+        Pass raw=True to get the record back as JSON text (see _parse_result).
+        """
         params: Dict[str, Any] = {}
         if fields:
-            params["sysparm_fields"] = ",".join(fields)
+            params["sysparm_fields"] = fields if isinstance(fields, str) else ",".join(fields)
         if display_value:
             params["sysparm_display_value"] = "true"
 
-        response = self.session.get(
-            self._url(f"/api/now/table/{table}/{sys_id}"),
-            params=params,
-            timeout=30,
-        )
-        return self._handle_response(response)
+        return self._request("GET", f"/api/now/table/{table}/{sys_id}", raw=raw, conditional=True, params=params)
 
     def create_record(
         self,
@@ -134,13 +503,8 @@ class ServiceNowClient:
         if input_display_value:
             params["sysparm_input_display_value"] = "true"
 
-        response = self.session.post(
-            self._url(f"/api/now/table/{table}"),
-            json=data,
-            params=params,
-            timeout=30,
-        )
-        return self._handle_response(response)
+        result = self._request("POST", f"/api/now/table/{table}", json=data, params=params)
+        return self._after_write(table, result)
 
     def update_record(
         self,
@@ -154,75 +518,211 @@ class ServiceNowClient:
         if input_display_value:
             params["sysparm_input_display_value"] = "true"
 
-        response = self.session.patch(
-            self._url(f"/api/now/table/{table}/{sys_id}"),
-            json=data,
-            params=params,
-            timeout=30,
-        )
-        return self._handle_response(response)
+        result = self._request("PATCH", f"/api/now/table/{table}/{sys_id}", json=data, params=params)
+        return self._after_write(table, result)
 
     def delete_record(self, table: str, sys_id: str) -> Dict:
         """Delete a record by sys_id."""
-        response = self.session.delete(
-            self._url(f"/api/now/table/{table}/{sys_id}"),
-            timeout=30,
+        result = self._request("DELETE", f"/api/now/table/{table}/{sys_id}")
+        return self._after_write(table, result)
+
+    def batch_rest(self, subrequests: List[Dict]) -> Dict:
+        """Send several REST calls in one round-trip via the Batch API.
+
+        Each subrequest has a `method`, an instance-relative `url`
+        (e.g. "/api/now/table/incident?sysparm_limit=1") and an optional
+        JSON-serializable `body`. On success `data` holds one result dict per
+        subrequest, in order, shaped like any other client call.
+        """
+        rest_requests = []
+        for i, sub in enumerate(subrequests):
+            req = {
+                "id": str(i),
+                "method": sub.get("method", "GET").upper(),
+                "url": sub["url"],
+                "headers": _BATCH_HEADERS,
+            }
+            if sub.get("body") is not None:
+                req["body"] = base64.b64encode(json.dumps(sub["body"]).encode("utf-8")).decode("ascii")
+            rest_requests.append(req)
+
+        outer = self._request(
+            "POST",
+            "/api/now/v1/batch",
+            json={"batch_request_id": str(uuid.uuid4()), "rest_requests": rest_requests},
+            timeout=60,
         )
-        return self._handle_response(response)
+        if not outer["success"]:
+            return outer
+
+        results = [{"success": False, "error": "Request was not serviced by the batch"}] * len(subrequests)
+        for served in outer["data"].get("serviced_requests", []):
+            body = base64.b64decode(served.get("body") or "")
+            results[int(served["id"])] = self._parse_result(served.get("status_code", 0), body)
+        return {"success": True, "data": results}
+
+    def batch(self, operations: List[Dict]) -> List[Dict]:
+        """Run several record reads and writes in as few round-trips as possible.
+
+        Each operation has a `method` (GET, POST, PATCH or DELETE), a `table`,
+        a `sys_id` (required except for POST) and, for POST/PATCH, `data`.
+        Every operation is checked before anything is sent; an invalid one
+        raises ValueError. Operations go through the Batch API in chunks of
+        BATCH_MAX. A chunk is replayed as individual calls only if the Batch
+        API refused it outright (_BATCH_NOT_RUN) or it is read-only; any
+        other failure may have applied its writes, so that chunk and the
+        ones after it are reported as failed rather than retried.
+        Results are returned in the same order as the operations.
+        """
+        for i, op in enumerate(operations):
+            method = str(op.get("method", "GET")).upper()
+            if method not in ("GET", "POST", "PATCH", "DELETE"):
+                raise ValueError(f"Operation {i}: unsupported method {method}")
+            if not op.get("table"):
+                raise ValueError(f"Operation {i}: table is required")
+            if method != "POST" and not op.get("sys_id"):
+                raise ValueError(f"Operation {i}: sys_id is required for {method}")
+            if method in ("POST", "PATCH") and not op.get("data"):
+                raise ValueError(f"Operation {i}: data is required for {method}")
+
+        results: List[Dict] = []
+        for start in range(0, len(operations), BATCH_MAX):
+            chunk = operations[start:start + BATCH_MAX]
+            methods = [op.get("method", "GET").upper() for op in chunk]
+            subrequests = []
+            for op, method in zip(chunk, methods):
+                path = f"/api/now/table/{op['table']}"
+                if method != "POST":
+                    path += f"/{op['sys_id']}"
+                if op.get("input_display_value"):
+                    path += "?sysparm_input_display_value=true"
+                subrequests.append({"method": method, "url": path, "body": op.get("data")})
+
+            try:
+                batch = self.batch_rest(subrequests)
+            except Exception as exc:
+                batch = {"success": False, "error": str(exc)}
+
+            if batch["success"]:
+                chunk_results = batch["data"]
+            elif batch.get("status_code") in _BATCH_NOT_RUN or all(m == "GET" for m in methods):
+                chunk_results = [self._run_operation(op) for op in chunk]
+            else:
+                # The instance may have run some of these writes: never replay
+                # them, and stop so later operations don't run out of order.
+                failure = {
+                    "success": False,
+                    "error": f"Batch request failed ({batch.get('error')}); its writes may "
+                             "have been applied and were not retried",
+                }
+                for op, method in zip(chunk, methods):
+                    if method != "GET":
+                        self._invalidate_table(op["table"])
+                skipped = {"success": False, "error": "Not sent: an earlier batch request failed"}
+                results.extend([failure] * len(chunk))
+                results.extend([skipped] * (len(operations) - start - len(chunk)))
+                return results
+
+            for op, method, result in zip(chunk, methods, chunk_results):
+                if method != "GET":
+                    self._after_write(op["table"], result)
+            results.extend(chunk_results)
+        return results
+
+    def _run_operation(self, op: Dict) -> Dict:
+        """Run one batch() operation as an ordinary client call."""
+        method = op.get("method", "GET").upper()
+        table = op["table"]
+        try:
+            if method == "GET":
+                return self.get_record(table, op["sys_id"])
+            if method == "POST":
+                return self.create_record(table, op["data"], op.get("input_display_value", False))
+            if method == "PATCH":
+                return self.update_record(table, op["sys_id"], op["data"], op.get("input_display_value", False))
+            if method == "DELETE":
+                return self.delete_record(table, op["sys_id"])
+            return {"success": False, "error": f"Unsupported method: {method}"}
+        except Exception as exc:
+            return {"success": False, "error": str(exc)}
+
+    def batch_query(self, specs: List[Dict]) -> List[Dict]:
+        """Run several query_records calls as one batch.
+
+        Each spec holds query_records keyword arguments. The queries go out
+        in a single Batch API request; if the Batch API is unavailable they
+        run concurrently as individual calls instead. Results are returned in
+        the same order as the specs.
+        """
+        def run(spec: Dict) -> Dict:
+            try:
+                return self.query_records(**spec)
+            except Exception as exc:
+                return {"success": False, "error": str(exc)}
+
+        if not specs:
+            return []
+
+        subrequests = []
+        for spec in specs:
+            params = {k: v for k, v in spec.items() if k != "table"}
+            subrequests.append({
+                "method": "GET",
+                "url": f"/api/now/table/{spec['table']}?{urlencode(self._query_params(**params))}",
+            })
+        batch = self.batch_rest(subrequests)
+        if batch["success"]:
+            return batch["data"]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(specs), 8)) as ex:
+            return list(ex.map(run, specs))
 
     # -------------------------------------------------------------------------
     # Schema helpers
     # -------------------------------------------------------------------------
 
+    @_ttl_cached(seconds=300)
     def get_table_schema(self, table: str) -> Dict:
         """Return all field definitions for a table (from sys_dictionary)."""
         return self.query_records(
             "sys_dictionary",
             query=f"name={table}^active=true^elementISNOTEMPTY",
-            fields=[
-                "element",
-                "column_label",
-                "internal_type",
-                "max_length",
-                "mandatory",
-                "read_only",
-                "reference",
-                "default_value",
-                "comments",
-                "active",
-            ],
+            fields=_SCHEMA_FIELDS,
             limit=500,
             display_value=True,
         )
 
+    @_ttl_cached(seconds=300)
     def search_tables(self, search_term: str, limit: int = 20) -> Dict:
         """Search for tables by name or label."""
         query = f"nameLIKE{search_term}^ORlabelLIKE{search_term}^super_classISNOTEMPTY"
         return self.query_records(
             "sys_db_object",
             query=query,
-            fields=["name", "label", "super_class", "sys_scope", "is_extendable"],
+            fields=_TABLE_FIELDS,
             limit=limit,
             display_value=True,
         )
 
+    @_ttl_cached(seconds=300)
     def get_update_sets(self, limit: int = 20) -> Dict:
         """List available update sets."""
         return self.query_records(
             "sys_update_set",
             query="state=in progress",
-            fields=["name", "description", "state", "sys_created_by", "sys_created_on"],
+            fields=_UPDATE_SET_FIELDS,
             limit=limit,
             display_value=True,
             order_by="name",
         )
 
+    @_ttl_cached(seconds=300)
     def get_application_scopes(self) -> Dict:
         """List available application scopes."""
         return self.query_records(
             "sys_scope",
             query="active=true",
-            fields=["name", "scope", "version", "active"],
+            fields=_SCOPE_FIELDS,
             limit=100,
             display_value=True,
         )
@@ -232,6 +732,6 @@ class ServiceNowClient:
         return self.query_records(
             "sys_user",
             query="",
-            fields=["user_name", "name", "email", "roles"],
+            fields=_USER_FIELDS,
             limit=1,
         )
@@ -14,10 +14,13 @@ Run with:
 """
 
 import os
+import asyncio
 import base64
-import mimetypes
+import collections
+import concurrent.futures
 import threading
 import json
+import weakref
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from pathlib import Path
@@ -27,8 +30,11 @@ import anthropic
 from dotenv import load_dotenv
 
 from snow_client import ServiceNowClient
-from snow_agent import SYSTEM_PROMPT
-from tools import TOOL_DEFINITIONS, execute_tool
+from snow_agent import (
+    CACHED_TOOLS, MAX_RESULT_CHARS, STREAM_IDLE_TIMEOUT, SYSTEM_PROMPT,
+    _elide_old_tool_results, _system_blocks,
+)
+from tools import compact_result, execute_tools_bulk
 
 load_dotenv()
 
@@ -39,8 +45,18 @@ try:
 except ImportError:
     HAS_PIL = False
 
+# ── Optional SIMD-accelerated base64 (pybase64 / libbase64) ─────────────────
+try:
+    from pybase64 import b64encode as _b64encode
+except ImportError:
+    _b64encode = base64.standard_b64encode
+
 # ── File type sets ────────────────────────────────────────────────────────────
 IMAGE_EXTS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}
+IMAGE_MIME = {
+    '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif', '.webp': 'image/webp', '.bmp': 'image/bmp',
+}
 TEXT_EXTS = {
     '.txt', '.py', '.js', '.ts', '.jsx', '.tsx', '.json', '.xml',
     '.yaml', '.yml', '.csv', '.md', '.html', '.css', '.sql', '.sh',
@@ -48,6 +64,26 @@ TEXT_EXTS = {
     '.cpp', '.c', '.h', '.go', '.rs', '.rb', '.php',
 }
 
+# File-dialog filters, built once
+_EXTS_IMG  = " ".join(f"*{e}" for e in sorted(IMAGE_EXTS))
+_EXTS_TEXT = " ".join(f"*{e}" for e in sorted(TEXT_EXTS))
+FILETYPES = [
+    ("Images & code", f"{_EXTS_IMG} {_EXTS_TEXT}"),
+    ("Images / screenshots", _EXTS_IMG),
+    ("Code / text files",    _EXTS_TEXT),
+    ("All files", "*.*"),
+]
+
+# ── Attachment encoding limits ────────────────────────────────────────────────
+B64_CHUNK = 57 * 1024   # bytes per base64 chunk; multiple of 3
+TEXT_CAP  = 120_000     # chars of a text attachment sent to Claude
+
+# ── Chat rendering ────────────────────────────────────────────────────────────
+TEXT_FLUSH_MS = 50      # streamed agent text is written to the chat at most every 50 ms
+MAX_CHAT_LINES = 5000   # older lines are dropped from the display (history is kept)
+THUMB_SIZE = (340, 220) # max size of inline image previews
+SEP = ("\n" + "─" * 80 + "\n", 'sep')  # turn separator (text, tag)
+
 # ── Catppuccin Mocha palette ──────────────────────────────────────────────────
 BG       = '#1e1e2e'
 MANTLE   = '#181825'
@@ -69,31 +105,124 @@ TEAL     = '#94e2d5'
 # Attachment
 # ─────────────────────────────────────────────────────────────────────────────
 
+# Encoded content blocks keyed by (path, mtime_ns, size). Bounded by total
+# encoded size rather than entry count, since attachments range from a few
+# bytes to many megabytes; the oldest entries are evicted first.
+CONTENT_CACHE_BYTES = 64 * 1024 * 1024
+_CONTENT_CACHE: Dict[tuple, dict] = {}
+_CONTENT_CACHE_SIZES: Dict[tuple, int] = {}
+_CONTENT_CACHE_LOCK = threading.Lock()
+
+
+def _cache_content_block(key: tuple, block: dict):
+    size = len(block["source"]["data"]) if block["type"] == "image" else len(block["text"])
+    if size > CONTENT_CACHE_BYTES:
+        return
+    with _CONTENT_CACHE_LOCK:
+        if key in _CONTENT_CACHE:
+            return
+        total = sum(_CONTENT_CACHE_SIZES.values()) + size
+        while total > CONTENT_CACHE_BYTES:
+            oldest = next(iter(_CONTENT_CACHE))
+            del _CONTENT_CACHE[oldest]
+            total -= _CONTENT_CACHE_SIZES.pop(oldest)
+        _CONTENT_CACHE[key] = block
+        _CONTENT_CACHE_SIZES[key] = size
+
+# Files API ids of uploaded images, keyed like _CONTENT_CACHE. Only touched
+# from the agent event loop.
+FILES_BETA = "files-api-2025-04-14"
+_FILE_IDS: Dict[tuple, str] = {}
+
+# Images at least this large are uploaded through the Files API (they are
+# re-sent with every later request); smaller ones go inline as base64
+FILE_UPLOAD_MIN_BYTES = 256 * 1024
+
+
 class Attachment:
     """A file (image or text/code) that will be sent to Claude."""
 
     def __init__(self, path: str):
+        p = Path(path)
         self.path = path
-        self.name = Path(path).name
-        self.ext  = Path(path).suffix.lower()
+        self.name = p.name
+        self.ext  = p.suffix.lower()
         self.is_image = self.ext in IMAGE_EXTS
+        try:
+            self.upload = self.is_image and os.path.getsize(path) >= FILE_UPLOAD_MIN_BYTES
+        except OSError:
+            self.upload = False
+        self.future: Optional[concurrent.futures.Future] = None  # pending to_content_block()
+        self.thumb:  Optional[concurrent.futures.Future] = None  # pending _make_thumbnail()
+
+    def _cache_key(self) -> Optional[tuple]:
+        """(path, mtime_ns, size), or None if the file can't be stat'ed."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (self.path, st.st_mtime_ns, st.st_size)
 
     def to_content_block(self) -> dict:
-        """Return an Anthropic API content block for this attachment."""
+        """Return an Anthropic API content block for this attachment.
+
+        Blocks are cached per (path, mtime, size), so re-sending an unchanged
+        file doesn't read and encode it again.
+        """
+        key = self._cache_key()
+        if key is None:
+            return self._build_content_block()
+        with _CONTENT_CACHE_LOCK:
+            block = _CONTENT_CACHE.get(key)
+        if block is None:
+            block = self._build_content_block()
+            _cache_content_block(key, block)
+        return block
+
+    async def file_block(self, api: anthropic.AsyncAnthropic) -> dict:
+        """Image block referencing this file through the Files API.
+
+        The image is uploaded once per (path, mtime, size); later sends, and
+        every later request that carries the history, refer to it by file_id
+        instead of re-sending ~1.33x its size as base64.
+        """
+        key = self._cache_key()
+        file_id = _FILE_IDS.get(key)
+        if file_id is None:
+            data = await asyncio.to_thread(Path(self.path).read_bytes)
+            mime = IMAGE_MIME.get(self.ext, 'image/png')
+            uploaded = await api.beta.files.upload(file=(self.name, data, mime))
+            file_id = uploaded.id
+            if key is not None:
+                _FILE_IDS[key] = file_id
+        return {"type": "image", "source": {"type": "file", "file_id": file_id}}
+
+    def _build_content_block(self) -> dict:
         if self.is_image:
+            # Encode in chunks (a multiple of 3 bytes, so no mid-stream
+            # padding) instead of holding the raw file and its encoding at once
+            buf = bytearray()
             with open(self.path, 'rb') as f:
-                data = base64.standard_b64encode(f.read()).decode('utf-8')
-            mime = mimetypes.guess_type(self.path)[0] or 'image/png'
+                while chunk := f.read(B64_CHUNK):
+                    buf += _b64encode(chunk)
+            data = buf.decode('ascii')
+            mime = IMAGE_MIME.get(self.ext, 'image/png')
             return {
                 "type": "image",
                 "source": {"type": "base64", "media_type": mime, "data": data},
             }
         else:
             try:
-                with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
-                    content = f.read()
-                if len(content) > 120_000:
-                    content = content[:120_000] + "\n…[truncated at 120 KB]"
+                size = os.path.getsize(self.path)
+                if size > TEXT_CAP and _looks_binary(self.path):
+                    # A large binary with a text extension: don't decode it
+                    content = f"[Binary file ({size:,} bytes) — not included]"
+                else:
+                    # Read one char past the cap to know whether to mark truncation
+                    with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                        content = f.read(TEXT_CAP + 1)
+                    if len(content) > TEXT_CAP:
+                        content = content[:TEXT_CAP] + "\n…[truncated at 120 KB]"
             except Exception as exc:
                 content = f"[Could not read file: {exc}]"
             return {
@@ -102,74 +231,172 @@ class Attachment:
             }
 
 
+def _looks_binary(path: str) -> bool:
+    """True if the first 8 KB of the file contain a NUL byte."""
+    with open(path, 'rb') as f:
+        return b'\0' in f.read(8192)
+
+
+class _BudgetSpent(Exception):
+    pass
+
+
+def _short_json(obj, budget: int = 260) -> str:
+    """json.dumps(obj, default=str) cut to `budget` chars, without encoding the rest.
+
+    Walks the value and stops as soon as the budget is spent; long strings
+    are sliced before being escaped. Large tool inputs (record data, file
+    contents) therefore cost O(budget) instead of a full serialization.
+    """
+    parts: List[str] = []
+    used = 0
+
+    def emit(s: str):
+        nonlocal used
+        parts.append(s)
+        used += len(s)
+        if used > budget:
+            raise _BudgetSpent
+
+    def walk(o):
+        if isinstance(o, dict):
+            emit("{")
+            for i, (k, v) in enumerate(o.items()):
+                emit((", " if i else "") + json.dumps(str(k)) + ": ")
+                walk(v)
+            emit("}")
+        elif isinstance(o, (list, tuple)):
+            emit("[")
+            for i, v in enumerate(o):
+                if i:
+                    emit(", ")
+                walk(v)
+            emit("]")
+        elif isinstance(o, str):
+            emit(json.dumps(o[:budget - used + 1]))
+        else:
+            emit(json.dumps(o, default=str))
+
+    try:
+        walk(obj)
+    except _BudgetSpent:
+        return "".join(parts)[:budget] + "…"
+    return "".join(parts)
+
+
+def _make_thumbnail(path: str):
+    """Decode and downscale an image for inline display (runs off the Tk thread).
+
+    Returns (raw_bytes, size, mode) for Image.frombytes, since PhotoImage
+    itself can only be created on the Tk thread.
+    """
+    img = Image.open(path)
+    img.thumbnail(THUMB_SIZE, Image.LANCZOS)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA')
+    return img.tobytes(), img.size, img.mode
+
+
 # ─────────────────────────────────────────────────────────────────────────────
-# Background agent worker
+# Agent turn (runs on the background asyncio loop)
 # ─────────────────────────────────────────────────────────────────────────────
 
-class AgentWorker(threading.Thread):
-    """Runs one conversation turn (with tool-use loop) in a daemon thread."""
-
-    def __init__(
-        self,
-        snow_client: ServiceNowClient,
-        content,           # str or list[dict] (multimodal)
-        history: list,
-        on_text,
-        on_tool,
-        on_done,
-        on_error,
-    ):
-        super().__init__(daemon=True)
-        self.snow_client = snow_client
-        self.content     = content
-        self.history     = history
-        self.on_text     = on_text
-        self.on_tool     = on_tool
-        self.on_done     = on_done
-        self.on_error    = on_error
-
-    def run(self):
+async def _attachment_block(api: anthropic.AsyncAnthropic, att: Attachment) -> dict:
+    """Content block for an attachment.
+
+    Large images, and images already uploaded earlier, are sent as a Files
+    API reference; everything else (and any failed upload) goes inline,
+    using the block encoded at attach time when there is one.
+    """
+    if att.is_image and (att.upload or att._cache_key() in _FILE_IDS):
         try:
-            api = anthropic.Anthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
-            self.history.append({"role": "user", "content": self.content})
-
-            for _ in range(50):
-                resp = api.messages.create(
-                    model="claude-opus-4-6",
-                    max_tokens=8192,
-                    system=SYSTEM_PROMPT,
-                    tools=TOOL_DEFINITIONS,
-                    messages=self.history,
+            return await att.file_block(api)
+        except Exception:
+            pass  # Files API unavailable — fall back to inline base64
+    if att.future is None:
+        return await asyncio.to_thread(att.to_content_block)
+    return await asyncio.wrap_future(att.future)
+
+
+async def _delete_uploads(api: anthropic.AsyncAnthropic):
+    """Delete every image this session uploaded to the Files API."""
+    file_ids = list(_FILE_IDS.values())
+    _FILE_IDS.clear()
+    await asyncio.gather(*(api.beta.files.delete(fid) for fid in file_ids), return_exceptions=True)
+
+
+# Everything but the messages is identical on every request, so the kwargs are
+# built once; the system block and tool list carry the prompt-cache breakpoints.
+_STREAM_KWARGS = dict(
+    model="claude-opus-4-6",
+    max_tokens=8192,
+    system=_system_blocks(SYSTEM_PROMPT),
+    tools=CACHED_TOOLS,
+    timeout=STREAM_IDLE_TIMEOUT,
+    betas=[FILES_BETA],
+)
+
+
+async def agent_turn(
+    api: anthropic.AsyncAnthropic,
+    snow_client: ServiceNowClient,
+    text: str,
+    attachments: List[Attachment],
+    history: list,
+    on_text,
+    on_tool,
+    on_done,
+    on_error,
+):
+    """Run one conversation turn (with tool-use loop).
+
+    Scheduled on App's event-loop thread, so request encoding, response
+    decoding and tool fan-out all stay off the Tk thread.
+    """
+    try:
+        # Build multimodal content for Claude
+        if attachments:
+            content = list(await asyncio.gather(*(_attachment_block(api, a) for a in attachments)))
+            if text:
+                content.append({"type": "text", "text": text})
+        else:
+            content = text
+        history.append({"role": "user", "content": content})
+
+        for _ in range(50):
+            _elide_old_tool_results(history)
+            # Text deltas go to the throttled chat flush as they arrive
+            async with api.beta.messages.stream(messages=history, **_STREAM_KWARGS) as stream:
+                async for text in stream.text_stream:
+                    on_text(text)
+                resp = await stream.get_final_message()
+            history.append({"role": "assistant", "content": resp.content})
+
+            if resp.stop_reason == "end_turn":
+                break
+
+            if resp.stop_reason == "tool_use":
+                tool_blocks = [b for b in resp.content if b.type == "tool_use"]
+                for block in tool_blocks:
+                    on_tool(block.name, block.input)
+                outputs = await asyncio.to_thread(
+                    execute_tools_bulk, [(block.name, block.input) for block in tool_blocks], snow_client
                 )
-                self.history.append({"role": "assistant", "content": resp.content})
-
-                for block in resp.content:
-                    if hasattr(block, 'text') and block.text:
-                        self.on_text(block.text)
-
-                if resp.stop_reason == "end_turn":
-                    break
-
-                if resp.stop_reason == "tool_use":
-                    results = []
-                    for block in resp.content:
-                        if block.type != "tool_use":
-                            continue
-                        self.on_tool(block.name, block.input)
-                        result = execute_tool(block.name, block.input, self.snow_client)
-                        results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": result,
-                        })
-                    self.history.append({"role": "user", "content": results})
-                else:
-                    break
+                history.append({"role": "user", "content": [
+                    {
+                        "type": "tool_result",
+                        "tool_use_id": block.id,
+                        "content": compact_result(result, MAX_RESULT_CHARS),
+                    }
+                    for block, result in zip(tool_blocks, outputs)
+                ]})
+            else:
+                break
 
-            self.on_done()
-        except Exception as exc:
-            import traceback
-            self.on_error(f"{exc}\n{traceback.format_exc()}")
+        on_done()
+    except Exception as exc:
+        import traceback
+        on_error(f"{exc}\n{traceback.format_exc()}")
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -185,12 +412,28 @@ class App:
         self.root.minsize(720, 520)
 
         self.snow_client: Optional[ServiceNowClient] = None
+        self.api: Optional[anthropic.AsyncAnthropic] = None
         self.history:     List[Dict] = []
         self.attachments: List[Attachment] = []
+        self._chip_widgets: List[tk.Frame] = []  # parallel to self.attachments
         self.busy  = False
-        self._imgs: List = []  # keep PIL PhotoImage refs alive
+        # PhotoImage refs for images shown in the chat, keyed by Tk image name;
+        # entries go away when their image is trimmed out of the widget
+        self._imgs: Dict[str, "ImageTk.PhotoImage"] = {}
+        # Thumbnails by (path, mtime); entries live as long as _imgs holds them
+        self._thumbs: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        # Attachments are read/encoded here as soon as they're picked
+        self._exec = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+        # Agent turns run as coroutines on this loop, in its own daemon thread
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        # Agent text from the worker, drained into the chat by _flush_text
+        self._text_queue: collections.deque = collections.deque()
+        self._text_lock = threading.Lock()
+        self._flush_pending = False
 
         self._build()
+        self.root.protocol("WM_DELETE_WINDOW", self._close)
         threading.Thread(target=self._connect, daemon=True).start()
 
     # ─────────────────────────────────────────────────────────────────────────
@@ -208,12 +451,13 @@ class App:
             bg=MANTLE, fg=TEXT, font=("Segoe UI", 11, "bold"),
         ).pack(side=tk.LEFT, padx=4)
 
-        tk.Button(
+        self._clear_btn = tk.Button(
             bar, text="Clear chat",
             bg=SURFACE0, fg=SUBTEXT, relief='flat',
             padx=10, pady=2, font=("Segoe UI", 9), cursor='hand2',
             command=self._clear,
-        ).pack(side=tk.RIGHT, padx=10, pady=5)
+        )
+        self._clear_btn.pack(side=tk.RIGHT, padx=10, pady=5)
 
         self._dot = tk.Label(bar, text="●", bg=MANTLE, fg=OVERLAY0, font=("Segoe UI", 14))
         self._dot.pack(side=tk.RIGHT, padx=2)
@@ -326,7 +570,8 @@ class App:
             self._ph_active = False
 
     def _ph_restore(self, _=None):
-        if not self.input_box.get('1.0', tk.END).strip():
+        # Index comparison: no copy of the input text just to test emptiness
+        if self.input_box.compare('end-1c', '==', '1.0'):
             self.input_box.insert('1.0', self._ph_text)
             self.input_box.configure(fg=OVERLAY0)
             self._ph_active = True
@@ -349,6 +594,9 @@ class App:
             t = c.test_connection()
             if not t.get("success"):
                 raise RuntimeError(t.get("error", "Unknown error"))
+            # One Anthropic client for the whole session, so its connection
+            # pool stays warm across turns
+            self.api = anthropic.AsyncAnthropic(api_key=os.environ["ANTHROPIC_API_KEY"])
             self.snow_client = c
             data = t.get("data", [])
             name = (data[0].get("name") or username) if isinstance(data, list) and data else username
@@ -372,10 +620,21 @@ class App:
     # ─────────────────────────────────────────────────────────────────────────
 
     def _w(self, text: str, tag: str):
+        self._w_many([(text, tag)])
+
+    def _w_many(self, pairs: List[tuple]):
+        """Insert several (text, tag) runs with one state toggle and one scroll."""
+        if not pairs:
+            return
+        # Follow new output only if the view was already at the bottom, so
+        # scrolling back to read earlier output isn't interrupted
+        at_bottom = self.chat.yview()[1] >= 0.999
         self.chat.configure(state=tk.NORMAL)
-        self.chat.insert(tk.END, text, tag)
+        for text, tag in pairs:
+            self.chat.insert(tk.END, text, tag)
         self.chat.configure(state=tk.DISABLED)
-        self.chat.see(tk.END)
+        if at_bottom:
+            self.chat.see(tk.END)
 
     def _sys(self, t: str):
         self._w(f"\n  {t}\n", 'system')
@@ -384,90 +643,131 @@ class App:
         self._w(f"\n  ⚠ {t}\n", 'err')
 
     def _sep(self):
-        self._w("\n" + "─" * 80 + "\n", 'sep')
-
-    def _user_header(self, text: str):
-        self._w("\nYou\n", 'you_lbl')
-        if text:
-            self._w(f"{text}\n", 'you_txt')
-
-    def _agent_header(self):
-        self._w("\nAgent\n", 'ai_lbl')
+        self._w(*SEP)
 
     def _agent_text(self, text: str):
         self._w(text, 'ai_txt')
 
+    def _queue_text(self, text: str):
+        """Called from the worker thread: buffer text for the next flush."""
+        with self._text_lock:
+            self._text_queue.append(text)
+            if self._flush_pending:
+                return
+            self._flush_pending = True
+        self.root.after(TEXT_FLUSH_MS, self._flush_text)
+
+    def _flush_text(self):
+        """Write all buffered agent text to the chat in one insert."""
+        with self._text_lock:
+            if not self._text_queue:
+                self._flush_pending = False
+                return
+            joined = "".join(self._text_queue)
+            self._text_queue.clear()
+            self._flush_pending = False
+        self._agent_text(joined)
+        self._trim_chat()
+
+    def _trim_chat(self):
+        """Drop the oldest display lines beyond MAX_CHAT_LINES.
+
+        Only the rendered chat is trimmed; self.history (what Claude sees) is
+        untouched. PhotoImage refs for images that scrolled out are released.
+        """
+        n = int(self.chat.index('end-1c').split('.')[0])
+        if n <= MAX_CHAT_LINES:
+            return
+        self.chat.configure(state=tk.NORMAL)
+        self.chat.delete('1.0', f'{n - MAX_CHAT_LINES}.0')
+        self.chat.configure(state=tk.DISABLED)
+        if self._imgs:
+            alive = {str(self.chat.image_cget(name, 'image')) for name in self.chat.image_names()}
+            self._imgs = {name: photo for name, photo in self._imgs.items() if name in alive}
+
     def _tool_line(self, name: str, inp: dict):
-        s = json.dumps(inp, default=str)
-        short = s[:260] + "…" if len(s) > 260 else s
-        self._w(f"\n  ↳ {name}({short})\n", 'tool_ln')
+        self._flush_text()  # keep tool lines after the text that preceded them
+        self._w(f"\n  ↳ {name}({_short_json(inp)})\n", 'tool_ln')
 
-    def _inline_image(self, path: str):
+    def _inline_image(self, att: Attachment):
         if not HAS_PIL:
-            self._w(f"  🖼 {Path(path).name}\n", 'file_lbl')
+            self._w(f"  🖼 {att.name}\n", 'file_lbl')
             return
         try:
-            img = Image.open(path)
-            img.thumbnail((340, 220), Image.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
-            self._imgs.append(photo)
+            key = (att.path, os.stat(att.path).st_mtime_ns)
+            photo = self._thumbs.get(key)
+            if photo is None:
+                # Decode + resample ran on the pool; only the PhotoImage,
+                # which must be built on the Tk thread, is created here
+                raw, size, mode = (att.thumb or self._exec.submit(_make_thumbnail, att.path)).result()
+                photo = ImageTk.PhotoImage(Image.frombytes(mode, size, raw))
+                self._thumbs[key] = photo
+            self._imgs[str(photo)] = photo
             self.chat.configure(state=tk.NORMAL)
             self.chat.insert(tk.END, "\n")
             self.chat.image_create(tk.END, image=photo, padx=18, pady=4)
             self.chat.insert(tk.END, "\n")
             self.chat.configure(state=tk.DISABLED)
-            self.chat.see(tk.END)
         except Exception:
-            self._w(f"  🖼 {Path(path).name}\n", 'file_lbl')
+            self._w(f"  🖼 {att.name}\n", 'file_lbl')
 
     # ─────────────────────────────────────────────────────────────────────────
     # Attachment management
     # ─────────────────────────────────────────────────────────────────────────
 
     def _browse(self):
-        exts_img  = " ".join(f"*{e}" for e in sorted(IMAGE_EXTS))
-        exts_text = " ".join(f"*{e}" for e in sorted(TEXT_EXTS))
         paths = filedialog.askopenfilenames(
             title="Attach files or screenshots",
-            filetypes=[
-                ("Images & code", f"{exts_img} {exts_text}"),
-                ("Images / screenshots", exts_img),
-                ("Code / text files",    exts_text),
-                ("All files", "*.*"),
-            ],
+            filetypes=FILETYPES,
         )
         for p in paths:
-            self.attachments.append(Attachment(p))
-        self._rebuild_chips()
-
-    def _rebuild_chips(self):
-        for w in self._chips.winfo_children():
-            w.destroy()
-
-        if not self.attachments:
+            att = Attachment(p)
+            if not att.upload:
+                # Images bound for the Files API are only encoded if the upload fails
+                att.future = self._exec.submit(att.to_content_block)
+            if att.is_image and HAS_PIL:
+                att.thumb = self._exec.submit(_make_thumbnail, p)
+            self.attachments.append(att)
+            self._add_chip(att)
+        self._sync_chips()
+
+    def _add_chip(self, att: Attachment):
+        icon = "🖼" if att.is_image else "📄"
+        chip = tk.Frame(self._chips, bg=SURFACE0, padx=4, pady=2)
+        chip.pack(side=tk.LEFT, padx=3)
+        tk.Label(
+            chip, text=f"{icon} {att.name}",
+            bg=SURFACE0, fg=TEXT, font=("Segoe UI", 8),
+        ).pack(side=tk.LEFT)
+        tk.Button(
+            chip, text=" ×", bg=SURFACE0, fg=OVERLAY0,
+            relief='flat', font=("Segoe UI", 9), cursor='hand2',
+            command=lambda a=att: self._rm_attachment(a),
+        ).pack(side=tk.LEFT)
+        self._chip_widgets.append(chip)
+
+    def _sync_chips(self):
+        """Show the attachment strip only while there are attachments."""
+        if self.attachments:
+            self._strip.grid()
+        else:
             self._strip.grid_remove()
-            return
 
-        self._strip.grid()
-
-        for i, att in enumerate(self.attachments):
-            icon = "🖼" if att.is_image else "📄"
-            chip = tk.Frame(self._chips, bg=SURFACE0, padx=4, pady=2)
-            chip.pack(side=tk.LEFT, padx=3)
-            tk.Label(
-                chip, text=f"{icon} {att.name}",
-                bg=SURFACE0, fg=TEXT, font=("Segoe UI", 8),
-            ).pack(side=tk.LEFT)
-            tk.Button(
-                chip, text=" ×", bg=SURFACE0, fg=OVERLAY0,
-                relief='flat', font=("Segoe UI", 9), cursor='hand2',
-                command=lambda i=i: self._rm_attachment(i),
-            ).pack(side=tk.LEFT)
-
-    def _rm_attachment(self, idx: int):
-        if 0 <= idx < len(self.attachments):
+    def _rm_attachment(self, att: Attachment):
+        # Chips are bound to the attachment object, not its index, so
+        # removing one leaves the others' callbacks valid
+        if att in self.attachments:
+            idx = self.attachments.index(att)
             self.attachments.pop(idx)
-        self._rebuild_chips()
+            self._chip_widgets.pop(idx).destroy()
+        self._sync_chips()
+
+    def _clear_attachments(self):
+        for chip in self._chip_widgets:
+            chip.destroy()
+        self._chip_widgets.clear()
+        self.attachments.clear()
+        self._sync_chips()
 
     # ─────────────────────────────────────────────────────────────────────────
     # Send / agent loop
@@ -480,54 +780,54 @@ class App:
             self._err("Not connected yet — please wait.")
             return
 
-        text = "" if self._ph_active else self.input_box.get('1.0', tk.END).strip()
+        text = "" if self._ph_active else self.input_box.get('1.0', 'end-1c').strip()
         if not text and not self.attachments:
             return
 
-        # Build multimodal content for Claude
-        if self.attachments:
-            blocks = [a.to_content_block() for a in self.attachments]
-            if text:
-                blocks.append({"type": "text", "text": text})
-            content = blocks
-        else:
-            content = text
-
-        # Render user turn in chat
-        self._user_header(text)
+        # Render user turn and agent header in chat, batching consecutive text
+        pairs = [("\nYou\n", 'you_lbl')]
+        if text:
+            pairs.append((f"{text}\n", 'you_txt'))
         for att in self.attachments:
             if att.is_image:
-                self._inline_image(att.path)
+                self._w_many(pairs)
+                pairs = []
+                self._inline_image(att)
             else:
-                self._w(f"  📄 {att.name}\n", 'file_lbl')
+                pairs.append((f"  📄 {att.name}\n", 'file_lbl'))
+        pairs.append(("\nAgent\n", 'ai_lbl'))
+        self._w_many(pairs)
+        self.chat.see(tk.END)  # always show the turn the user just sent
 
         # Clear input & attachments
+        attachments = list(self.attachments)
         self.input_box.delete('1.0', tk.END)
         self._ph_active = False
-        self.attachments.clear()
-        self._rebuild_chips()
+        self._clear_attachments()
 
         # Kick off agent worker
         self._set_busy(True)
-        self._agent_header()
 
-        AgentWorker(
+        asyncio.run_coroutine_threadsafe(agent_turn(
+            api=self.api,
             snow_client=self.snow_client,
-            content=content,
+            text=text,
+            attachments=attachments,
             history=self.history,
-            on_text=lambda t: self.root.after(0, lambda t=t: self._agent_text(t)),
+            on_text=self._queue_text,
             on_tool=lambda n, i: self.root.after(0, lambda n=n, i=i: self._tool_line(n, i)),
             on_done=lambda: self.root.after(0, self._agent_done),
             on_error=lambda e: self.root.after(0, lambda e=e: self._agent_error(e)),
-        ).start()
+        ), self._loop)
 
     def _agent_done(self):
+        self._flush_text()
         self._sep()
         self._set_busy(False)
 
     def _agent_error(self, msg: str):
-        self._err(f"Agent error: {msg}")
-        self._sep()
+        self._flush_text()
+        self._w_many([(f"\n  ⚠ Agent error: {msg}\n", 'err'), SEP])
         self._set_busy(False)
 
     def _set_busy(self, busy: bool):
@@ -535,6 +835,8 @@ class App:
         state = tk.DISABLED if busy else tk.NORMAL
         self._send_btn.configure(state=state)
         self._attach_btn.configure(state=state)
+        # A running turn still references the uploads that clearing deletes
+        self._clear_btn.configure(state=state)
         self.input_box.configure(state=state)
         if busy:
             self._send_btn.configure(text="Working…", bg=SURFACE1, fg=OVERLAY0)
@@ -550,8 +852,21 @@ class App:
         self.chat.configure(state=tk.NORMAL)
         self.chat.delete('1.0', tk.END)
         self.chat.configure(state=tk.DISABLED)
+        self._imgs.clear()
+        if self.api:
+            asyncio.run_coroutine_threadsafe(_delete_uploads(self.api), self._loop)
         self._sys("Conversation cleared.")
 
+    def _close(self):
+        # Don't leave the session's screenshots stored in the account
+        if self.api:
+            done = asyncio.run_coroutine_threadsafe(_delete_uploads(self.api), self._loop)
+            try:
+                done.result(timeout=5)
+            except Exception:
+                pass
+        self.root.destroy()
+
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Entry point
@@ -3,17 +3,39 @@ Tool definitions (for Anthropic API) and their execution handlers.
 Each tool maps to one or more ServiceNowClient methods.
 """
 
+import concurrent.futures
 import json
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple, TypedDict
 
 from snow_client import ServiceNowClient
 
+# orjson encodes large result sets several times faster than the json module
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+# fastjsonschema compiles each input_schema into a plain Python function
+try:
+    import fastjsonschema
+except ImportError:
+    fastjsonschema = None
+
 
 # ---------------------------------------------------------------------------
 # Tool schemas passed to Claude
 # ---------------------------------------------------------------------------
 
-TOOL_DEFINITIONS = [
+# A tuple so the schemas are built once at import and can be shared (and
+# extended into cached variants) without anyone mutating the original.
+TOOL_DEFINITIONS = (
     {
         "name": "query_records",
         "description": (
@@ -66,6 +88,61 @@ TOOL_DEFINITIONS = [
             "required": ["table"],
         },
     },
+    {
+        "name": "batch_query_records",
+        "description": (
+            "Run several query_records reads in one call; they are sent to the instance "
+            "as a single batch request. "
+            "Prefer this over separate query_records calls whenever you need to read from "
+            "more than one table (e.g. sys_dictionary + sys_ui_section + sys_ui_element). "
+            "Results are returned in the same order as the queries."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "queries": {
+                    "type": "array",
+                    "description": "List of queries, each with the same fields as query_records.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "table": {"type": "string", "description": "ServiceNow table name"},
+                            "query": {"type": "string", "description": "Encoded query string"},
+                            "fields": {
+                                "type": "array",
+                                "items": {"type": "string"},
+                                "description": "Fields to return (omit for all)",
+                            },
+                            "limit": {"type": "integer", "description": "Max records (default 10)"},
+                            "offset": {"type": "integer", "description": "Records to skip"},
+                            "display_value": {"type": "boolean", "description": "Return display values"},
+                            "order_by": {"type": "string", "description": "Field to sort by"},
+                        },
+                        "required": ["table"],
+                    },
+                },
+            },
+            "required": ["queries"],
+        },
+    },
+    {
+        "name": "count_records",
+        "description": (
+            "Count the records in a ServiceNow table that match an encoded query, without "
+            "returning them. Use this instead of query_records for 'how many' questions."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "table": {"type": "string", "description": "ServiceNow table name"},
+                "query": {
+                    "type": "string",
+                    "description": "ServiceNow encoded query string. Leave empty to count all records.",
+                },
+            },
+            "required": ["table"],
+        },
+    },
     {
         "name": "get_record",
         "description": "Retrieve a single record from a ServiceNow table by its sys_id.",
@@ -161,6 +238,45 @@ TOOL_DEFINITIONS = [
             "required": ["table", "sys_id"],
         },
     },
+    {
+        "name": "batch_records",
+        "description": (
+            "Get, create, update or delete several records in one call; the operations are "
+            "sent to the instance as a single batch request. "
+            "Prefer this over separate get_record/create_record/update_record/delete_record "
+            "calls when you have more than two of them ready at once (e.g. adding several "
+            "choices or fields). Operations run in order and results are returned in the "
+            "same order."
+        ),
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "requests": {
+                    "type": "array",
+                    "description": "List of record operations (at most 100 per batch request).",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "method": {
+                                "type": "string",
+                                "enum": ["GET", "POST", "PATCH", "DELETE"],
+                                "description": "GET = get_record, POST = create, PATCH = update, DELETE = delete",
+                            },
+                            "table": {"type": "string", "description": "ServiceNow table name"},
+                            "sys_id": {"type": "string", "description": "Record sys_id (not used for POST)"},
+                            "data": {"type": "object", "description": "Field values for POST/PATCH"},
+                            "input_display_value": {
+                                "type": "boolean",
+                                "description": "Set reference fields using display values",
+                            },
+                        },
+                        "required": ["method", "table"],
+                    },
+                },
+            },
+            "required": ["requests"],
+        },
+    },
     {
         "name": "get_table_schema",
         "description": (
@@ -211,77 +327,264 @@ TOOL_DEFINITIONS = [
             "required": [],
         },
     },
-]
+)
+
+
+def _compile_validator(schema: Dict) -> Callable[[Dict], Optional[str]]:
+    """Build a checker that returns an error message for bad input, else None.
+
+    Without fastjsonschema only the top-level required fields are checked.
+    """
+    if fastjsonschema is not None:
+        validate = fastjsonschema.compile(schema, use_default=False)
+
+        def check(inp: Dict) -> Optional[str]:
+            try:
+                validate(inp)
+            except fastjsonschema.JsonSchemaException as exc:
+                return exc.message
+            return None
+        return check
+
+    required = tuple(schema.get("required", ()))
+
+    def check(inp: Dict) -> Optional[str]:
+        if not isinstance(inp, dict):
+            return "input must be an object"
+        missing = [name for name in required if name not in inp]
+        if missing:
+            return f"missing required field(s): {', '.join(missing)}"
+        return None
+    return check
+
+
+# Tool name -> input checker, compiled once from TOOL_DEFINITIONS
+_VALIDATORS: Dict[str, Callable[[Dict], Optional[str]]] = {
+    td["name"]: _compile_validator(td["input_schema"]) for td in TOOL_DEFINITIONS
+}
 
 
 # ---------------------------------------------------------------------------
 # Tool execution
 # ---------------------------------------------------------------------------
 
+# Tools that change instance data; within one turn these run one at a time
+MUTATING_TOOLS = frozenset({"create_record", "update_record", "delete_record", "batch_records"})
+
+# Shared by every execute_tools_bulk call; the client's semaphore still
+# bounds how many requests reach ServiceNow at once
+MAX_TOOL_WORKERS = 8
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+
+
 def execute_tool(tool_name: str, tool_input: Dict, client: ServiceNowClient) -> str:
-    """Execute a named tool and return the result as a JSON string."""
+    """Execute a named tool and return the result as a compact JSON string.
+
+    Input that does not match the tool's schema is rejected before any REST
+    call is made.
+    """
     try:
+        check = _VALIDATORS.get(tool_name)
+        error = check(tool_input) if check else None
+        if error:
+            return _error_json(f"Invalid input for {tool_name}: {error}")
         result = _dispatch(tool_name, tool_input, client)
     except Exception as exc:
-        result = {"success": False, "error": str(exc)}
+        return _error_json(str(exc))
+
+    if "raw" in result:
+        # Already-serialized result JSON: splice it in rather than decoding
+        # and re-encoding it.
+        return '{"success":true,"data":' + result["raw"] + "}"
+    return _dumps(result)
+
+
+def _error_json(message: str) -> str:
+    """The {"success": false, "error": ...} result, with only the message encoded."""
+    return '{"success":false,"error":' + json.dumps(message) + "}"
+
+
+def compact_result(result_str: str, cap: int = 8192) -> str:
+    """Shrink an execute_tool result to at most about `cap` chars for the history.
+
+    Small results pass through unchanged. In larger ones a long `data` list
+    is replaced by a count and a sample of the first records; anything still
+    too large is cut off.
+    """
+    if len(result_str) <= cap:
+        return result_str
+    try:
+        result = _loads(result_str)
+        data = result.get("data")
+        if isinstance(data, list) and len(data) > 10:
+            result["data"] = {"truncated": True, "count": len(data), "sample": data[:10]}
+        compact = _dumps(result)
+    except (ValueError, AttributeError):
+        compact = result_str
+    if len(compact) <= cap:
+        return compact
+    return compact[:cap] + "...(truncated)"
+
+
+def execute_tools_bulk(
+    calls: List[Tuple[str, Dict]],
+    client: ServiceNowClient,
+    on_result: Optional[Callable[[int, str], None]] = None,
+) -> List[str]:
+    """Execute one turn's tool calls and return their results in call order.
+
+    The model's order is kept around writes (MUTATING_TOOLS): each write
+    waits for the reads issued before it, and reads issued after it start
+    only once it has finished. Consecutive reads between two writes run
+    concurrently on a shared thread pool. `on_result(index, result)` is
+    called in the calling thread as each result becomes available.
+    """
+    results: List[Optional[str]] = [None] * len(calls)
+    pending: Dict[concurrent.futures.Future, int] = {}
+
+    def drain():
+        for future in concurrent.futures.as_completed(pending):
+            i = pending[future]
+            results[i] = future.result()
+            if on_result:
+                on_result(i, results[i])
+        pending.clear()
+
+    for i, (name, inp) in enumerate(calls):
+        if name not in MUTATING_TOOLS:
+            pending[_EXECUTOR.submit(execute_tool, name, inp, client)] = i
+            continue
+        drain()
+        results[i] = execute_tool(name, inp, client)
+        if on_result:
+            on_result(i, results[i])
+    drain()
+    return results
+
+
+class QueryInput(TypedDict, total=False):
+    """query_records input (also each item of batch_query_records.queries)."""
+    table: str
+    query: str
+    fields: List[str]
+    limit: int
+    offset: int
+    display_value: bool
+    order_by: str
+
+
+class RecordInput(TypedDict, total=False):
+    """get_record / create_record / update_record / delete_record input."""
+    table: str
+    sys_id: str
+    fields: List[str]
+    display_value: bool
+    data: Dict
+    input_display_value: bool
+
+
+def _query_spec(q: QueryInput) -> Dict:
+    """query_records keyword arguments from a tool input, with the schema defaults."""
+    return {
+        "table": q["table"],
+        "query": q.get("query", ""),
+        "fields": q.get("fields"),
+        "limit": q.get("limit", 10),
+        "offset": q.get("offset", 0),
+        "display_value": q.get("display_value", False),
+        "order_by": q.get("order_by", ""),
+    }
+
+
+def _query_records(inp: QueryInput, client: ServiceNowClient) -> Dict:
+    return client.query_records(**_query_spec(inp), raw=True)
+
+
+def _batch_query_records(inp: Dict, client: ServiceNowClient) -> Dict:
+    specs = [_query_spec(q) for q in inp["queries"]]
+    return {"success": True, "data": client.batch_query(specs)}
+
+
+def _count_records(inp: Dict, client: ServiceNowClient) -> Dict:
+    return client.count(inp["table"], inp.get("query", ""))
+
+
+def _get_record(inp: RecordInput, client: ServiceNowClient) -> Dict:
+    return client.get_record(
+        table=inp["table"],
+        sys_id=inp["sys_id"],
+        fields=inp.get("fields"),
+        display_value=inp.get("display_value", False),
+        raw=True,
+    )
+
+
+def _create_record(inp: RecordInput, client: ServiceNowClient) -> Dict:
+    return client.create_record(
+        table=inp["table"],
+        data=inp["data"],
+        input_display_value=inp.get("input_display_value", False),
+    )
+
+
+def _update_record(inp: RecordInput, client: ServiceNowClient) -> Dict:
+    return client.update_record(
+        table=inp["table"],
+        sys_id=inp["sys_id"],
+        data=inp["data"],
+        input_display_value=inp.get("input_display_value", False),
+    )
+
+
+def _delete_record(inp: RecordInput, client: ServiceNowClient) -> Dict:
+    return client.delete_record(
+        table=inp["table"],
+        sys_id=inp["sys_id"],
+    )
+
+
+def _batch_records(inp: Dict, client: ServiceNowClient) -> Dict:
+    return {"success": True, "data": client.batch(inp["requests"])}
+
+
+def _get_table_schema(inp: Dict, client: ServiceNowClient) -> Dict:
+    return client.get_table_schema(inp["table"])
+
+
+def _search_tables(inp: Dict, client: ServiceNowClient) -> Dict:
+    return client.search_tables(
+        search_term=inp["search_term"],
+        limit=inp.get("limit", 20),
+    )
+
+
+def _get_update_sets(inp: Dict, client: ServiceNowClient) -> Dict:
+    return client.get_update_sets(inp.get("limit", 20))
+
+
+def _get_application_scopes(inp: Dict, client: ServiceNowClient) -> Dict:
+    return client.get_application_scopes()
+
 
-    return json.dumps(result, indent=2, default=str)
+# Tool name -> handler(tool_input, client); one entry per TOOL_DEFINITIONS item
+_HANDLERS: Dict[str, Callable[[Dict, ServiceNowClient], Dict]] = {
+    "query_records": _query_records,
+    "batch_query_records": _batch_query_records,
+    "count_records": _count_records,
+    "get_record": _get_record,
+    "create_record": _create_record,
+    "update_record": _update_record,
+    "delete_record": _delete_record,
+    "batch_records": _batch_records,
+    "get_table_schema": _get_table_schema,
+    "search_tables": _search_tables,
+    "get_update_sets": _get_update_sets,
+    "get_application_scopes": _get_application_scopes,
+}
 
 
 def _dispatch(tool_name: str, inp: Dict, client: ServiceNowClient) -> Dict:
-    if tool_name == "query_records":
-        return client.query_records(
-            table=inp["table"],
-            query=inp.get("query", ""),
-            fields=inp.get("fields"),
-            limit=inp.get("limit", 10),
-            offset=inp.get("offset", 0),
-            display_value=inp.get("display_value", False),
-            order_by=inp.get("order_by", ""),
-        )
-
-    if tool_name == "get_record":
-        return client.get_record(
-            table=inp["table"],
-            sys_id=inp["sys_id"],
-            fields=inp.get("fields"),
-            display_value=inp.get("display_value", False),
-        )
-
-    if tool_name == "create_record":
-        return client.create_record(
-            table=inp["table"],
-            data=inp["data"],
-            input_display_value=inp.get("input_display_value", False),
-        )
-
-    if tool_name == "update_record":
-        return client.update_record(
-            table=inp["table"],
-            sys_id=inp["sys_id"],
-            data=inp["data"],
-            input_display_value=inp.get("input_display_value", False),
-        )
-
-    if tool_name == "delete_record":
-        return client.delete_record(
-            table=inp["table"],
-            sys_id=inp["sys_id"],
-        )
-
-    if tool_name == "get_table_schema":
-        return client.get_table_schema(inp["table"])
-
-    if tool_name == "search_tables":
-        return client.search_tables(
-            search_term=inp["search_term"],
-            limit=inp.get("limit", 20),
-        )
-
-    if tool_name == "get_update_sets":
-        return client.get_update_sets(inp.get("limit", 20))
-
-    if tool_name == "get_application_scopes":
-        return client.get_application_scopes()
-
-    return {"success": False, "error": f"Unknown tool: {tool_name}"}
+    handler = _HANDLERS.get(tool_name)
+    if handler is None:
+        return {"success": False, "error": f"Unknown tool: {tool_name}"}
+    return handler(inp, client)